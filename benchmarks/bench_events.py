@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the events plugin
+================================
+
+Generates a synthetic corpus of Pelican articles with event metadata and
+times the stages of the plugin separately, reporting throughput and peak
+memory of each stage.
+
+Usage:
+
+    python benchmarks/bench_events.py --sizes 100 1000 10000
+
+The corpus mixes `event-duration` and `event-end`, several languages and a
+few recurring events with native and natural language rules.
+"""
+
+import argparse
+import gc
+import importlib.util
+import os.path
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+from types import SimpleNamespace
+
+from pelican import contents
+from pelican.settings import DEFAULT_CONFIG
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LANGUAGES = ('en', 'de', 'fr')
+DURATIONS = ('1h', '2h 30m', '45m', '1d', '3h')
+SUMMARIES = (
+    'Plain text summary of event {i}',
+    '<p>Summary of <b>event {i}</b>, with markup; and special characters</p>',
+    '<p>Workshop {i}</p><ul><li>bring a laptop</li><li>bring friends</li></ul>',
+)
+RECURRING_EVENTS = [
+    {
+        'title': 'Monthly meeting',
+        'summary': '<p>We are meeting every fourth tuesday</p>',
+        'page_url': 'monthly_meeting.html',
+        'location': 'Pizza Bob Street 1',
+        'rrule': 'FREQ=MONTHLY;BYDAY=4TU;DTSTART=20230528T190000',
+        'event-duration': '2h',
+    },
+    {
+        'title': 'Open lab',
+        'summary': 'Open lab every day',
+        'page_url': 'open_lab.html',
+        'location': 'Lab',
+        'rrule': 'FREQ=DAILY;DTSTART=20230101T180000',
+        'event-duration': '3h',
+    },
+    {
+        'title': 'Weekly repair cafe',
+        'summary': '<p>Repair cafe</p>',
+        'page_url': 'repair_cafe.html',
+        'location': 'Workshop',
+        'recurring_rule': 'every saturday',
+        'event-duration': '4h',
+    },
+]
+
+
+def load_plugin():
+    """Load events.py as standalone module, the plugin directory is not
+    necessarily an importable package name"""
+    spec = importlib.util.spec_from_file_location(
+        'events_plugin_benchmark', os.path.join(PLUGIN_DIR, 'events.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_settings(output_path, cache_path, with_recurring):
+    settings = dict(DEFAULT_CONFIG)
+    settings['OUTPUT_PATH'] = output_path
+    settings['CACHE_PATH'] = cache_path
+    settings['SITEURL'] = 'https://example.org'
+    settings['PLUGINS'] = ['i18n_subsites']
+    settings['PLUGIN_EVENTS'] = {
+        'ics_fname': 'calendar.ics',
+        'metadata_field_for_summary': 'summary',
+        'now': '2024-06-01T12:00:00',
+    }
+    if with_recurring:
+        settings['PLUGIN_EVENTS'].update(
+            recurring_events=RECURRING_EVENTS,
+            recurring_window_days=365,
+        )
+    return settings
+
+
+def make_corpus(size, settings, seed=0):
+    """Generate `size` articles with event metadata spread around the
+    `now` of the settings
+
+    :returns: list of contents.Article
+    """
+    rnd = random.Random(seed)
+    now = datetime(2024, 6, 1, 12, 0)
+    articles = []
+    for i in range(size):
+        start = now + timedelta(days=rnd.randint(-3 * 365, 365),
+                                minutes=15 * rnd.randint(0, 4 * 24))
+        metadata = {
+            'title': 'Event %d' % i,
+            'slug': 'event-%d' % i,
+            'lang': LANGUAGES[i % len(LANGUAGES)],
+            'date': start - timedelta(days=rnd.randint(1, 60)),
+            'summary': SUMMARIES[i % len(SUMMARIES)].format(i=i),
+            'event-start': start.strftime('%Y-%m-%d %H:%M'),
+        }
+        if i % 2:
+            metadata['event-duration'] = DURATIONS[i % len(DURATIONS)]
+        else:
+            end = start + timedelta(hours=rnd.randint(1, 50))
+            metadata['event-end'] = end.strftime('%Y-%m-%d %H:%M')
+        if i % 3 == 0:
+            metadata['event-location'] = 'Room %d, Street %d' % (i % 17, i % 5)
+        if i % 50 == 0:
+            metadata['status'] = 'draft'
+        articles.append(contents.Article('', metadata=metadata, settings=settings))
+    return articles
+
+
+def measure(fn, with_memory, setup=None):
+    """Run fn once for its wall time and, if requested, a second time under
+    tracemalloc for its peak memory
+
+    setup is called before each run of fn and is not measured.
+
+    :returns: (seconds, peak bytes or None)
+    """
+    if setup is not None:
+        setup()
+    gc.collect()
+    start = perf_counter()
+    fn()
+    seconds = perf_counter() - start
+
+    peak = None
+    if with_memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return seconds, peak
+
+
+def run(size, with_memory=True):
+    """Benchmark all stages on a corpus of the given size
+
+    :returns: list of (stage, items, seconds, peak bytes) tuples
+    """
+    events = load_plugin()
+    tmpdir = tempfile.mkdtemp(prefix='events-bench-')
+    try:
+        settings = make_settings(os.path.join(tmpdir, 'output'), os.path.join(tmpdir, 'cache'),
+                                 with_recurring=True)
+        generator = SimpleNamespace(settings=settings, context={})
+        # articles belong to a site without recurring events so that parsing
+        # them is measured on its own
+        article_settings = make_settings(settings['OUTPUT_PATH'], settings['CACHE_PATH'],
+                                         with_recurring=False)
+        articles = make_corpus(size, article_settings)
+        results = []
+        parsed = []
+
+        def parse_articles():
+            build = events.events_registry.build(
+                SimpleNamespace(settings=article_settings, context={}))
+            for article in articles:
+                events.parse_article(article)
+            parsed[:] = build.events
+
+        seconds, peak = measure(parse_articles, with_memory)
+        results.append(('parse_article', size, seconds, peak))
+
+        build = events.EventsBuild(generator)
+
+        def insert_recurring():
+            del build.events[:]
+            events.insert_recurring_events(build)
+
+        seconds, peak = measure(insert_recurring, with_memory)
+        occurrences = len(build.events)
+        results.append(('insert_recurring_events', occurrences, seconds, peak))
+
+        # the remaining stages work on the parsed articles and occurrences
+        build.events[:] = parsed + build.events
+        events.generate_localized_events(build)
+
+        seconds, peak = measure(lambda: events.generate_ical_file(build), with_memory)
+        results.append(('generate_ical_file', len(build.events), seconds, peak))
+
+        seconds, peak = measure(lambda: events.prepare_display_fields(build), with_memory)
+        results.append(('prepare_display_fields', len(build.events), seconds, peak))
+
+        seconds, peak = measure(lambda: events.populate_context_variables(build), with_memory)
+        results.append(('populate_context_variables', len(build.events), seconds, peak))
+
+        summaries = [article.metadata['summary'] for article in articles]
+
+        def strip_summaries():
+            for summary in summaries:
+                events.strip_html_tags(summary)
+
+        # the earlier stages already stripped the summaries, without
+        # clearing the cache only its lookups would be measured
+        seconds, peak = measure(strip_summaries, with_memory,
+                                setup=events.strip_markup.cache_clear)
+        results.append(('strip_html_tags', len(summaries), seconds, peak))
+
+        return results
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def format_results(size, results):
+    lines = ['corpus of %d articles' % size,
+             '  %-28s %10s %10s %14s %12s' % ('stage', 'items', 'seconds', 'items/s', 'peak KiB')]
+    for stage, items, seconds, peak in results:
+        lines.append('  %-28s %10d %10.4f %14.0f %12s' % (
+            stage, items, seconds, items / seconds if seconds else float('inf'),
+            '%.0f' % (peak / 1024) if peak is not None else '-'))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='corpus sizes to benchmark, up to 1000000')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc pass measuring peak memory')
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        print(format_results(size, run(size, with_memory=not args.no_memory)))
+        print()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Import time benchmark for the events plugin
+===========================================
+
+Imports the plugin in fresh interpreters, after Pelican itself is loaded,
+and reports how long importing it takes and which modules it pulls in.
+
+Usage:
+
+    python benchmarks/bench_import.py --runs 20
+
+Exits with a non zero status when one of the dependencies that are only
+needed by optional features is imported together with the plugin.
+"""
+
+import argparse
+import json
+import os.path
+import statistics
+import subprocess
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# only needed once recurring events, ics files or markup in summaries show up
+DEFERRED_MODULES = (
+    'concurrent.futures',
+    'dateutil.rrule',
+    'html.parser',
+    'icalendar',
+    'pytz',
+    'recurrent',
+)
+
+PROBE = '''
+import importlib.util
+import json
+import sys
+from time import perf_counter
+
+from pelican import signals, utils, contents
+
+before = set(sys.modules)
+start = perf_counter()
+spec = importlib.util.spec_from_file_location('events', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+seconds = perf_counter() - start
+
+print(json.dumps({
+    'seconds': seconds,
+    'modules': sorted(set(sys.modules) - before),
+    'preloaded': sorted(name for name in json.loads(sys.argv[2]) if name in before),
+}))
+'''
+
+
+def probe():
+    """Import the plugin in a fresh interpreter
+
+    :returns: dict
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, os.path.join(PLUGIN_DIR, 'events.py'),
+         json.dumps(DEFERRED_MODULES)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=10,
+                        help='number of fresh interpreters to import the plugin in')
+    parser.add_argument('--verbose', action='store_true',
+                        help='list every module imported together with the plugin')
+    args = parser.parse_args(argv)
+
+    results = [probe() for _ in range(args.runs)]
+    timings = [result['seconds'] * 1000 for result in results]
+    modules = results[0]['modules']
+
+    print('import time: median %.2f ms, min %.2f ms, max %.2f ms over %d runs' %
+          (statistics.median(timings), min(timings), max(timings), args.runs))
+    print('modules imported with the plugin: %d' % len(modules))
+    if args.verbose:
+        for name in modules:
+            print('  %s' % name)
+
+    preloaded = results[0]['preloaded']
+    if preloaded:
+        print('already imported by Pelican, not measured: %s' % ', '.join(preloaded))
+
+    eager = [name for name in DEFERRED_MODULES
+             if any(module == name or module.startswith(name + '.') for module in modules)]
+    if eager:
+        print('imported eagerly: %s' % ', '.join(eager))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
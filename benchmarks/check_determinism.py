@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Determinism check for the events plugin
+=======================================
+
+Builds the synthetic corpus of bench_events.py twice with different `now`
+settings on the same day and compares the files written, once with the
+occurrences of the recurring events expanded and once with them described
+by their RRULE.
+
+Usage:
+
+    python benchmarks/check_determinism.py --size 1000
+
+Exits with a non zero status when the builds differ. Articles starting on
+the build day are left out, whether they are upcoming legitimately depends
+on the time of the build.
+"""
+
+import argparse
+import filecmp
+import os.path
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from bench_events import load_plugin, make_corpus, make_settings
+
+BUILD_DAY = '2024-06-01'
+BUILD_TIMES = ('09:15:42.250000', '17:48:03')
+MODES = {
+    'expanded': {},
+    'rrule': {'ics_recurring_rrule': True},
+}
+
+
+def build_site(events, output_path, cache_path, now, size, mode):
+    """Run a single build with the given `now` writing to output_path"""
+    settings = make_settings(output_path, cache_path, with_recurring=True)
+    # a single calendar holding the articles of all languages and the
+    # occurrences of the recurring events
+    settings['PLUGINS'] = []
+    settings['PLUGIN_EVENTS'].update(MODES[mode], now=now)
+
+    generator = SimpleNamespace(settings=settings, context={})
+    events.events_registry.build(generator)
+    for article in make_corpus(size, settings):
+        if not article.metadata['event-start'].startswith(BUILD_DAY):
+            events.parse_article(article)
+    events.events_registry.finalize(generator)
+
+
+def compare_outputs(left, right):
+    """Names of the files differing between two output directories
+
+    :returns: list of str
+    """
+    comparison = filecmp.dircmp(left, right)
+    differing = comparison.left_only + comparison.right_only
+    differing += filecmp.cmpfiles(left, right, comparison.common_files, shallow=False)[1]
+    return sorted(differing)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--size', type=int, default=1000,
+                        help='number of articles in the corpus')
+    args = parser.parse_args(argv)
+
+    events = load_plugin()
+    tmpdir = tempfile.mkdtemp(prefix='events-determinism-')
+    failed = False
+    try:
+        for mode in MODES:
+            outputs = []
+            for build_time in BUILD_TIMES:
+                output_path = os.path.join(tmpdir, mode, build_time)
+                os.makedirs(output_path)
+                build_site(events, output_path, os.path.join(tmpdir, 'cache'),
+                           '%sT%s' % (BUILD_DAY, build_time), args.size, mode)
+                outputs.append(output_path)
+
+            differing = compare_outputs(*outputs)
+            if differing:
+                failed = True
+                print('%s: builds at %s differ in %s' % (
+                    mode, ' and '.join(BUILD_TIMES), ', '.join(differing)))
+            else:
+                print('%s: builds at %s are identical' % (mode, ' and '.join(BUILD_TIMES)))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
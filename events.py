@@ -13,18 +13,26 @@ Author: Federico Ceratto <federico.ceratto@gmail.com>
 Released under AGPLv3+ license, see LICENSE
 """
 
-from dateutil import rrule
-from recurrent.event_parser import RecurringEvent
-from datetime import datetime, timedelta, timezone
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, timezone
 from pelican import signals, utils, contents
+from pelican.paginator import Paginator
 from collections import namedtuple, defaultdict
-from html.parser import HTMLParser
-import icalendar
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import takewhile
+import importlib.metadata
 from io import StringIO
+import hashlib
+import json
 import logging
 import os.path
-import pytz
+import pickle
 import re
+import shutil
+import threading
+import time as system_time
+from time import perf_counter
 
 log = logging.getLogger(__name__)
 
@@ -36,69 +44,267 @@ TIME_MULTIPLIERS = {
     's': 'seconds'
 }
 
-events = []
-localized_events = defaultdict(list)
+PLUGIN_VERSION = '1.1.0'
+METADATA_CACHE_FNAME = 'events_plugin_metadata.pickle'
+RRULE_CACHE_FNAME = 'events_plugin_rrules.pickle'
+VEVENT_CACHE_FNAME = 'events_plugin_vevents.pickle'
 
+RecurringRule = namedtuple('RecurringRule', ['event', 'dtstart', 'duration', 'rrule', 'dtstamp', 'tzid'])
 
-class MLStripper(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.reset()
-        self.strict = False
-        self.convert_charrefs= True
-        self.text = StringIO()
-    def handle_data(self, d):
-        self.text.write(d)
-    def get_data(self):
-        return self.text.getvalue()
+# names of the caches as in PLUGIN_EVENTS and the build statistics, the
+# metadata cache maps source_path -> (fingerprint, event_plugin_data), the
+# recurring rule cache (recurring_rule, recurrent version, anchor date or
+# None) -> RFC rrule and the VEVENT cache digest of the fields of a VEVENT
+# -> serialized VEVENT
+CACHE_NAMES = ('metadata_cache', 'recurring_rule_cache', 'vevent_cache')
 
+# maps cache file name -> SharedCache, see shared_cache()
+shared_caches = {}
+shared_caches_lock = threading.Lock()
 
-def strip_html_tags(html):
-    s = MLStripper()
+@lru_cache(maxsize=None)
+def ml_stripper_class():
+    """The HTML stripping parser, defined on first use so html.parser is
+    only imported once a summary actually contains markup
+
+    :returns: type
+    """
+    from html.parser import HTMLParser
+
+    class MLStripper(HTMLParser):
+        def __init__(self):
+            super().__init__()
+            self.reset()
+            self.strict = False
+            self.convert_charrefs= True
+        def reset(self):
+            super().reset()
+            self.text = StringIO()
+        def handle_data(self, d):
+            self.text.write(d)
+        def get_data(self):
+            return self.text.getvalue()
+
+    return MLStripper
+
+
+STRIP_HTML_CACHE_SIZE = 4096
+
+# HTMLParser instances are not thread safe, every thread reuses its own
+ml_strippers = threading.local()
+
+
+@lru_cache(maxsize=STRIP_HTML_CACHE_SIZE)
+def strip_markup(html):
+    s = getattr(ml_strippers, 'stripper', None)
+    if s is None:
+        s = ml_strippers.stripper = ml_stripper_class()()
+    else:
+        s.reset()
     s.feed(html)
     return s.get_data()
 
 
-def parse_tstamp(metadata, field_name):
+def strip_html_tags(html):
+    # neither tags nor character references, nothing to strip
+    if '<' not in html and '&' not in html:
+        return html
+    return strip_markup(html)
+
+
+# maps (year, month, day, hour) -> local tzinfo, see check_local_tzinfo_cache()
+local_tzinfo_cache = {}
+local_tzinfo_lock = threading.Lock()
+# system timezone the cached tzinfos belong to
+local_tzinfo_zone = None
+
+
+def check_local_tzinfo_cache():
+    """Forget the cached tzinfos if the system timezone changed since they
+    were cached"""
+    global local_tzinfo_zone
+
+    with local_tzinfo_lock:
+        zone = system_timezone()
+        if zone != local_tzinfo_zone:
+            local_tzinfo_cache.clear()
+            local_tzinfo_zone = zone
+
+
+def localize(value):
+    """Attach the local system timezone to a naive datetime, like
+    value.astimezone() does, but asking the system only once per hour of
+    local time
+
+    :returns: datetime
+    """
+    key = (value.year, value.month, value.day, value.hour)
+    tzinfo = local_tzinfo_cache.get(key)
+    if tzinfo is not None:
+        return value.replace(tzinfo=tzinfo)
+
+    localized = value.astimezone()
+
+    # only hours entirely on one side of a DST transition share their tzinfo
+    first = value.replace(minute=0).astimezone()
+    last = value.replace(minute=59).astimezone()
+    if first.tzinfo == last.tzinfo == localized.tzinfo and \
+            first.hour == last.hour == localized.hour == value.hour:
+        local_tzinfo_cache[key] = localized.tzinfo
+
+    return localized
+
+
+def parse_fixed_tstamp(value):
+    """Parse "YYYY-MM-DD HH:MM" by slicing, falling back to strptime for
+    anything not in exactly that shape
+
+    :returns: naive datetime
+    """
+    # int() would take signs and spaces that strptime rejects, so every
+    # field has to be digits only
+    if len(value) == 16 and value[4] == '-' and value[7] == '-' and value[10] == ' ' \
+            and value[13] == ':' and value.isascii() and value[0:4].isdigit() \
+            and value[5:7].isdigit() and value[8:10].isdigit() \
+            and value[11:13].isdigit() and value[14:16].isdigit():
+        try:
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]))
+        except ValueError:
+            pass
+
+    return datetime.strptime(value, '%Y-%m-%d %H:%M')
+
+
+def parse_tstamp(metadata, field_name, iso=False):
     """Parse a timestamp string in format "YYYY-MM-DD HH:MM"
 
+    With iso set any ISO 8601 timestamp is accepted, an explicit UTC offset
+    is kept as it is.
+
     :returns: datetime
     """
     try:
+        if iso:
+            value = datetime.fromisoformat(metadata[field_name])
+            if value.tzinfo is not None:
+                return value
+        else:
+            value = parse_fixed_tstamp(metadata[field_name])
+
         # assume local system timezone when parsing datetime
-        return datetime.strptime(metadata[field_name], '%Y-%m-%d %H:%M').astimezone()
+        return localize(value)
     except Exception as e:
         log.error("Unable to parse the '%s' field in the event named '%s': %s" \
             % (field_name, metadata['title'], e))
         raise
 
 
+DURATION_NUMBER = r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)'
+DURATION_CHUNK_RE = re.compile(r'(%s)([%s])' % (DURATION_NUMBER, ''.join(TIME_MULTIPLIERS)))
+DURATION_TOKEN_RE = re.compile(r'(?:%s[%s])+' % (DURATION_NUMBER, ''.join(TIME_MULTIPLIERS)))
+ISO_DURATION_RE = re.compile(
+    r'P(?:(?P<weeks>\d+(?:\.\d+)?)W)?(?:(?P<days>\d+(?:\.\d+)?)D)?'
+    r'(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?'
+    r'(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def duration_from_string(value):
+    """Parse a duration like "2h 30m", "1h30m" or ISO 8601 "PT1H30M"
+
+    Repeated units add up.
+
+    :returns: timedelta
+    """
+    value = value.strip()
+
+    iso = ISO_DURATION_RE.fullmatch(value)
+    if iso and value.upper() not in ('P', 'PT'):
+        return timedelta(**{unit: float(amount) for unit, amount in iso.groupdict().items()
+                            if amount is not None})
+
+    tdargs = defaultdict(float)
+    for token in value.split():
+        if not DURATION_TOKEN_RE.fullmatch(token):
+            if token[-1].isalpha() and token[-1] not in TIME_MULTIPLIERS:
+                raise RuntimeError("Unknown time multiplier '%s'" % token)
+            raise ValueError("Unable to parse '%s'" % token)
+        for amount, multiplier in DURATION_CHUNK_RE.findall(token):
+            tdargs[TIME_MULTIPLIERS[multiplier]] += float(amount)
+
+    return timedelta(**tdargs)
+
+
 def parse_timedelta(metadata):
-    """Parse a timedelta string in format [<num><multiplier> ]*
-    e.g. 2h 30m
+    """Parse a timedelta string in format [<num><multiplier>[ ]]* or as
+    ISO 8601 duration, e.g. 2h 30m, 2h30m or PT2H30M
 
     :returns: timedelta
     """
+    try:
+        return duration_from_string(metadata['event-duration'])
+    except RuntimeError as e:
+        log.error("""Unknown time multiplier in the 'event-duration' field in the \
+'%s' event: %s. Supported multipliers are: '%s'.""" % (metadata['title'], e, ' '.join(TIME_MULTIPLIERS)))
+        raise
+    except ValueError as e:
+        log.error("""Unable to parse the 'event-duration' field in the '%s' event: \
+%s.""" % (metadata['title'], e))
+        raise
 
-    chunks = metadata['event-duration'].split()
-    tdargs = {}
-    for c in chunks:
-        try:
-            m = TIME_MULTIPLIERS[c[-1]]
-            val = float(c[:-1])
-            tdargs[m] = val
-        except KeyError:
-            log.error("""Unknown time multiplier '%s' value in the \
-'event-duration' field in the '%s' event. Supported multipliers \
-are: '%s'.""" % (c, metadata['title'], ' '.join(TIME_MULTIPLIERS)))
-            raise RuntimeError("Unknown time multiplier '%s'" % c)
-        except ValueError:
-            log.error("""Unable to parse '%s' value in the 'event-duration' \
-field in the '%s' event.""" % (c, metadata['title']))
-            raise ValueError("Unable to parse '%s'" % c)
 
+def report_build_stats(build):
+    """Log the collected build statistics and optionally write them as JSON
+    file to OUTPUT_PATH"""
+    build_stats = build.stats
+
+    for cache_name in CACHE_NAMES:
+        state = build.cache_stats[cache_name]
+        lookups = state['hits'] + state['misses']
+        build_stats[cache_name] = {
+            'hits': state['hits'],
+            'misses': state['misses'],
+            'hit_rate': state['hits'] / lookups if lookups else None,
+        }
+
+    for name, stage in build_stats.get('stages', {}).items():
+        log.info("events plugin: %s took %.3fs in %d calls (%d events in, %d events out)" %
+                 (name, stage['seconds'], stage['calls'], stage['events_in'], stage['events_out']))
+    log.info("events plugin: %d bytes of calendar written, %d unchanged calendars skipped, "
+             "metadata cache hit rate %s, recurring rule cache hit rate %s, "
+             "VEVENT cache hit rate %s" % (
+                 build_stats.get('ics_bytes_written', 0),
+                 build_stats.get('ics_files_unchanged', 0),
+                 build_stats['metadata_cache']['hit_rate'],
+                 build_stats['recurring_rule_cache']['hit_rate'],
+                 build_stats['vevent_cache']['hit_rate']))
+
+    stats_fname = build.settings['PLUGIN_EVENTS'].get('stats_fname')
+    if not stats_fname:
+        return
 
-    return timedelta(**tdargs)
+    stats_fname = os.path.join(build.settings['OUTPUT_PATH'], stats_fname)
+    os.makedirs(os.path.dirname(stats_fname), exist_ok=True)
+    with open(stats_fname, 'w') as f:
+        json.dump(build_stats, f, indent=2, sort_keys=True)
+
+
+def snapshot_build_now(generator):
+    """Capture the point in time the build is based on
+
+    PLUGIN_EVENTS['now'] overrides the system clock with a datetime or an
+    ISO 8601 string so that builds are reproducible.
+
+    :returns: timezone aware datetime
+    """
+    now = generator.settings['PLUGIN_EVENTS'].get('now')
+    if now is None:
+        now = datetime.now()
+    elif isinstance(now, str):
+        now = datetime.fromisoformat(now)
+
+    return now.astimezone()
 
 
 def basic_utc_isoformat(datetime_value):
@@ -110,6 +316,318 @@ def basic_utc_isoformat(datetime_value):
     return stripped_iso_timestamp + 'Z'
 
 
+def basic_local_isoformat(datetime_value):
+    """Format the wall time of a datetime as RFC 5545 DATE-TIME without
+    timezone, to be qualified by a TZID parameter
+
+    :returns: str
+    """
+    pure_datetime = datetime_value.replace(tzinfo=None)
+    iso_timestamp = pure_datetime.isoformat(timespec='seconds')
+
+    return iso_timestamp.replace('-','').replace(':', '')
+
+
+class Event:
+    """A single event, either created from an article with event metadata
+    or an occurrence of one of the `recurring_events`
+
+    Attributes of the article an event was created from are available on
+    the event as well, and `event_plugin_data` and `metadata` keep working
+    as before so templates do not have to care which kind of event they
+    render.
+    """
+    __slots__ = ('source', 'dtstart', 'dtend', 'date', 'location', 'uid', 'recurring',
+                 '_display')
+
+    def __init__(self, source, dtstart, dtend, date, location=None, uid=None, recurring=False):
+        self.source = source
+        self.dtstart = dtstart
+        self.dtend = dtend
+        self.date = date
+        self.location = location
+        self.uid = uid
+        self.recurring = recurring
+        # (dtstart, dtend, end time, summary field), see prepare_display_fields()
+        self._display = None
+
+    @classmethod
+    def from_article(cls, article, dtstart, dtend):
+        return cls(article, dtstart, dtend, article.metadata.get('date'),
+                   location=article.metadata.get('event-location'))
+
+    @property
+    def is_article(self):
+        return not isinstance(self.source, dict)
+
+    @property
+    def article(self):
+        return self.source if self.is_article else None
+
+    @property
+    def url(self):
+        if self.is_article:
+            return self.source.url
+        return f"pages/{self.source['page_url']}"
+
+    @property
+    def metadata(self):
+        if self.is_article:
+            return self.source.metadata
+        return {
+            'title': self.source['title'],
+            'summary': self.source['summary'],
+            'date': self.date,
+            'event-location': self.location,
+        }
+
+    @property
+    def event_plugin_data(self):
+        return self
+
+    def __getitem__(self, key):
+        if key in ('dtstart', 'dtend') or (key in ('uid', 'recurring') and getattr(self, key)):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the event itself
+        if name.startswith('_') or name == 'source':
+            raise AttributeError(name)
+        if self.is_article:
+            return getattr(self.source, name)
+        try:
+            return self.source[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def plain_summary(self, metadata_field_for_event_summary):
+        """Summary text without markup as written into the ics file"""
+        return strip_html_tags(self.metadata[metadata_field_for_event_summary])
+
+    @property
+    def same_day(self):
+        return self.dtstart.date() == self.dtend.date()
+
+    @property
+    def dtstart_display(self):
+        return self._display and self._display[0]
+
+    @property
+    def dtend_display(self):
+        return self._display and self._display[1]
+
+    @property
+    def dtend_time_display(self):
+        return self._display and self._display[2]
+
+    @property
+    def summary_text(self):
+        # stripped when a template asks for it, most never do
+        if not self._display:
+            return None
+        field = self._display[3]
+        return self.plain_summary(field) if field in self.metadata else ''
+
+    @property
+    def dtstart_utc(self):
+        return basic_utc_isoformat(self.dtstart)
+
+    @property
+    def dtend_utc(self):
+        return basic_utc_isoformat(self.dtend)
+
+    @property
+    def dtstamp_utc(self):
+        return basic_utc_isoformat(self.date)
+
+
+def event_sort_key(event):
+    """Events in order of start and end, the url breaks ties so that the
+    order never depends on the read order
+    """
+    return (event.dtstart, event.dtend, event.url)
+
+
+def load_pickle_cache(cache_fname, description):
+    """Load a cache of previous builds, any problem just means starting over
+
+    :returns: dict or None
+    """
+    if not os.path.exists(cache_fname):
+        return None
+
+    try:
+        with open(cache_fname, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        log.warning("Unable to load the %s %s: %s" % (description, cache_fname, e))
+        return None
+
+    return cached if isinstance(cached, dict) else None
+
+
+def save_pickle_cache(cache_fname, description, data):
+    """Store a cache for the next build
+
+    :returns: True on success
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_fname), exist_ok=True)
+        with open(cache_fname, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        log.warning("Unable to save the %s %s: %s" % (description, cache_fname, e))
+        return False
+
+    return True
+
+
+def metadata_cache_path(settings):
+    return os.path.join(settings['CACHE_PATH'], METADATA_CACHE_FNAME)
+
+
+def system_timezone():
+    """Identity of the local system timezone naive timestamps are parsed in
+
+    :returns: tuple
+    """
+    return (system_time.tzname, system_time.timezone, system_time.altzone)
+
+
+def source_fingerprint(content):
+    """Fingerprint of the source file an article was read from, along with
+    everything else deciding how its timestamps are parsed
+
+    :returns: (mtime, size, PLUGIN_VERSION, iso_timestamps, system timezone)
+              tuple or None if unavailable
+    """
+    if not content.source_path:
+        return None
+
+    try:
+        st = os.stat(content.source_path)
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size, PLUGIN_VERSION,
+            bool(content.settings['PLUGIN_EVENTS'].get('iso_timestamps', False)),
+            system_timezone())
+
+
+class SharedCache:
+    """A cache kept in memory for the whole process and as pickle in
+    CACHE_PATH between builds, shared by all builds using the same file
+
+    `data` may be read at any time, it is only changed or pickled while
+    holding `lock`. Hits and misses are counted by every build on its own.
+    `users` is pickled along with `data`, so that a build in a new process
+    still knows the entries the other sites sharing the cache use.
+    """
+
+    def __init__(self, cache_fname, description):
+        self.fname = cache_fname
+        self.description = description
+        self.lock = threading.Lock()
+        # maps OUTPUT_PATH -> keys used by the latest build writing there
+        self.users = {}
+        self.data = {}
+
+        cached = load_pickle_cache(cache_fname, description) if cache_fname else None
+        if cached and isinstance(cached.get('users'), dict) and isinstance(cached.get('data'), dict):
+            self.users = cached['users']
+            self.data = cached['data']
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+
+    def save(self):
+        """Pickle the cache, the caller holds the lock
+
+        :returns: True on success
+        """
+        return save_pickle_cache(self.fname, self.description,
+                                 {'users': self.users, 'data': self.data})
+
+
+def shared_cache(cache_fname, description):
+    """The cache stored in cache_fname, loaded by the first build using it
+
+    Without cache_fname the cache lives in memory only.
+
+    :returns: SharedCache
+    """
+    with shared_caches_lock:
+        cache = shared_caches.get(cache_fname)
+        if cache is None:
+            cache = shared_caches[cache_fname] = SharedCache(cache_fname, description)
+    return cache
+
+
+def load_metadata_cache(build):
+    """Load the parsed event metadata of previous builds from CACHE_PATH"""
+
+    if build.settings['PLUGIN_EVENTS'].get('metadata_cache', False):
+        build.caches['metadata_cache'] = shared_cache(
+            metadata_cache_path(build.settings), 'events metadata cache')
+
+
+def save_metadata_cache(build):
+    """Store the parsed event metadata in CACHE_PATH for the next build"""
+
+    cache = build.caches.get('metadata_cache')
+    if cache is None:
+        return
+
+    stats = build.cache_stats['metadata_cache']
+    log.debug("Events metadata cache: %d hits, %d misses" % (stats['hits'], stats['misses']))
+
+    with cache.lock:
+        stale = [path for path in cache.data if not os.path.exists(path)]
+        for path in stale:
+            del cache.data[path]
+
+        if (stats['dirty'] or stale) and cache.save():
+            stats['dirty'] = False
+
+
+def parse_event_plugin_data(metadata, iso=False):
+    """Compute the event start and end of an article from its metadata
+
+    :returns: dict
+    """
+    dtstart = parse_tstamp(metadata, 'event-start', iso)
+
+    if 'event-end' in metadata:
+        dtend = parse_tstamp(metadata, 'event-end', iso)
+
+    elif 'event-duration' in metadata:
+        dtdelta = parse_timedelta(metadata)
+        dtend = dtstart + dtdelta
+
+    else:
+        msg = "Either 'event-end' or 'event-duration' must be" + \
+            " speciefied in the event named '%s'" % metadata['title']
+        log.error(msg)
+        raise ValueError(msg)
+
+    return {"dtstart": dtstart, "dtend": dtend}
+
+
 def parse_article(content):
     """Collect articles metadata to be used for building the event calendar
 
@@ -121,156 +639,1404 @@ def parse_article(content):
     if 'event-start' not in content.metadata:
         return
 
-    dtstart = parse_tstamp(content.metadata, 'event-start')
+    build = events_registry.get(content.settings)
+    if build is None:
+        log.debug("No events build in progress for the article '%s'" % content.metadata['title'])
+        return
 
-    if 'event-end' in content.metadata:
-        dtend = parse_tstamp(content.metadata, 'event-end')
+    with build.measure_stage('parse_article') as stage:
+        stage['events_in'] += 1
+        parse_event_article(build, content, stage)
 
-    elif 'event-duration' in content.metadata:
-        dtdelta = parse_timedelta(content.metadata)
-        dtend = dtstart + dtdelta
 
+def parse_event_article(build, content, stage):
+    cache = build.caches.get('metadata_cache')
+    stats = build.cache_stats['metadata_cache']
+    fingerprint = source_fingerprint(content) if cache is not None else None
+    cached = cache.data.get(content.source_path) if fingerprint else None
+
+    if cached and cached[0] == fingerprint:
+        stats['hits'] += 1
+        event_plugin_data = cached[1]
     else:
-        msg = "Either 'event-end' or 'event-duration' must be" + \
-            " speciefied in the event named '%s'" % content.metadata['title']
-        log.error(msg)
-        raise ValueError(msg)
+        event_plugin_data = parse_event_plugin_data(
+            content.metadata, content.settings['PLUGIN_EVENTS'].get('iso_timestamps', False))
+        if fingerprint:
+            stats['misses'] += 1
+            stats['dirty'] = True
+            cache.set(content.source_path, (fingerprint, event_plugin_data))
 
-    content.event_plugin_data = {"dtstart": dtstart, "dtend": dtend}
+    event = Event.from_article(content, event_plugin_data['dtstart'], event_plugin_data['dtend'])
+    content.event_plugin_data = event
 
     if not 'status' in content.metadata or content.metadata['status'] != 'draft':
-        events.append(content)
+        build.events.append(event)
+        stage['events_out'] += 1
 
 
-def insert_recurring_events(generator):
-    global events
+@lru_cache(maxsize=None)
+def recurrent_version():
+    """Installed version of recurrent, looked up once per process"""
+    try:
+        return importlib.metadata.version('recurrent')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
 
-    class AttributeDict(dict):
-        __getattr__ = dict.__getitem__
-        __setattr__ = dict.__setitem__
-        __delattr__ = dict.__delitem__
+def load_rrule_cache(build):
+    """Load the compiled recurring rules of previous builds from CACHE_PATH
 
-    if not 'recurring_events' in generator.settings['PLUGIN_EVENTS']:
+    Without `recurring_rule_cache` the rules are still kept in memory for the
+    whole process so that additional generation passes like the ones of
+    i18n_subsites never hit the parser.
+    """
+    if build.settings['PLUGIN_EVENTS'].get('recurring_rule_cache', False):
+        cache_fname = os.path.join(build.settings['CACHE_PATH'], RRULE_CACHE_FNAME)
+    else:
+        cache_fname = None
+
+    build.caches['recurring_rule_cache'] = shared_cache(cache_fname, 'recurring rules cache')
+
+
+def save_rrule_cache(build):
+    """Store the compiled recurring rules in CACHE_PATH for the next build"""
+
+    cache = build.caches.get('recurring_rule_cache')
+    if cache is None or cache.fname is None:
         return
 
-    for event in generator.settings['PLUGIN_EVENTS']['recurring_events']:
-        recurring_rule = event['recurring_rule']
-        r = RecurringEvent(now_date=datetime.now())
+    stats = build.cache_stats['recurring_rule_cache']
+    log.debug("Recurring rules cache: %d hits, %d misses" % (stats['hits'], stats['misses']))
+
+    today = build.now.date()
+    with cache.lock:
+        outdated = [key for key in cache.data if key[2] is not None and key[2] < today]
+        for key in outdated:
+            del cache.data[key]
+
+        if (stats['dirty'] or outdated) and cache.save():
+            stats['dirty'] = False
+
+
+def compile_recurring_rule(build, recurring_rule, now):
+    """Compile a recurring rule in natural language into an RFC rrule string
+
+    Results are cached by rule text and recurrent version. Rules whose
+    result depends on the date they are compiled at (e.g. "until next
+    month") are additionally keyed by that date.
+
+    :returns: str
+    """
+    cache = build.caches.get('recurring_rule_cache')
+    if cache is None:
+        cache = build.caches['recurring_rule_cache'] = shared_cache(None, 'recurring rules cache')
+    stats = build.cache_stats['recurring_rule_cache']
+    version = recurrent_version()
+    anchor_date = now.date()
+
+    for key in ((recurring_rule, version, None), (recurring_rule, version, anchor_date)):
+        rfc_rrule = cache.data.get(key)
+        if rfc_rrule is not None:
+            stats['hits'] += 1
+            return rfc_rrule
+
+    stats['misses'] += 1
+    stats['dirty'] = True
+
+    # recurrent pulls in parsedatetime and is only loaded when a rule
+    # actually needs the natural language parser
+    from recurrent.event_parser import RecurringEvent
+
+    def parse(anchor):
+        r = RecurringEvent(now_date=anchor)
         r.parse(recurring_rule)
-        rr = rrule.rrulestr(r.get_RFC_rrule())
-        next_occurrence = rr.after(datetime.now())
+        return r.get_RFC_rrule()
+
+    rfc_rrule = parse(now)
+
+    # compiling at a different weekday, month and year tells whether the
+    # result depends on the anchor date
+    if parse(now + timedelta(days=397)) == rfc_rrule:
+        cache.set((recurring_rule, version, None), rfc_rrule)
+    else:
+        cache.set((recurring_rule, version, anchor_date), rfc_rrule)
+
+    return rfc_rrule
+
+
+def normalize_rrule(rfc_rrule):
+    """Turn a single line RFC 5545 rule like FREQ=MONTHLY;BYDAY=4TU;DTSTART=...
+    into the DTSTART/RRULE lines understood by dateutil
+
+    :returns: str
+    """
+    if '\n' in rfc_rrule.strip():
+        return rfc_rrule
+
+    rule = rfc_rrule.strip()
+    if rule.upper().startswith('RRULE:'):
+        rule = rule[len('RRULE:'):]
+
+    dtstart = None
+    parts = []
+    for part in rule.split(';'):
+        if part.upper().startswith('DTSTART='):
+            dtstart = part[len('DTSTART='):]
+        else:
+            parts.append(part)
+
+    rule = 'RRULE:' + ';'.join(parts)
+    if dtstart:
+        rule = 'DTSTART:%s\n%s' % (dtstart, rule)
+
+    return rule
+
+
+def parse_recurring_rule(build, event, now):
+    """Build the dateutil rrule of a recurring event
+
+    A native RFC 5545 `rrule` is used as is, a `recurring_rule` in natural
+    language is compiled first.
+
+    :returns: dateutil.rrule.rrule
+    """
+    # rules without a DTSTART start at the beginning of the build day
+    # rather than at the build time, so that every build of a day results
+    # in the same occurrences and the same calendar
+    anchor = datetime.combine(now.date(), time())
+
+    if 'rrule' in event:
+        rfc_rrule = normalize_rrule(event['rrule'])
+    else:
+        rfc_rrule = compile_recurring_rule(build, event['recurring_rule'], anchor)
+
+    from dateutil import rrule
+
+    try:
+        return rrule.rrulestr(rfc_rrule, cache=True, dtstart=anchor)
+    except Exception as e:
+        log.error("Unable to parse the recurring rule of the event named '%s': %s"
+                  % (event['title'], e))
+        raise
+
+
+def recurring_occurrences(rr, now, settings):
+    """Lazily yield the occurrences of a recurrence rule after now
+
+    Without a `recurring_window_days` or `recurring_max_occurrences` setting
+    only the next occurrence is yielded.
+
+    :returns: iterator of datetime
+    """
+    window_days = settings.get('recurring_window_days')
+    max_occurrences = settings.get('recurring_max_occurrences')
+
+    if window_days is None and max_occurrences is None:
+        max_occurrences = 1
+
+    occurrences = rr.xafter(now, count=max_occurrences)
+
+    if window_days is not None:
+        horizon = now + timedelta(days=window_days)
+        occurrences = takewhile(lambda occurrence: occurrence <= horizon, occurrences)
+
+    return occurrences
+
+
+def ical_recur(rr, tzinfo=None):
+    """RECUR value of a dateutil rrule as written into the ics file, with
+    UNTIL in UTC as RFC 5545 demands for a DTSTART in UTC or with TZID
+
+    tzinfo is the timezone of the wall time of a naive rule. dateutil keeps
+    UNTIL in UTC already for rules with a timezone aware DTSTART.
+
+    :returns: str
+    """
+    recur = str(rr).split('RRULE:', 1)[1]
+
+    def until_utc(match):
+        until = datetime.strptime(match.group(1), '%Y%m%dT%H%M%S')
+        return 'UNTIL=' + basic_utc_isoformat(until.replace(tzinfo=tzinfo or timezone.utc))
+
+    recur = re.sub(r'UNTIL=(\d{8}T\d{6})Z?', until_utc, recur)
+
+    # let icalendar bring the parts into its canonical order so the
+    # streaming writer and the icalendar based one agree
+    import icalendar
+
+    return icalendar.vRecur.from_ical(recur).to_ical().decode('utf-8')
 
+
+def ical_duration(value):
+    """Format a timedelta as RFC 5545 DURATION value, e.g. P1DT2H30M
+
+    :returns: str
+    """
+    seconds = int(value.total_seconds())
+    sign = '-' if seconds < 0 else ''
+    seconds = abs(seconds)
+
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+
+    if days and not (hours or minutes or seconds) and days % 7 == 0:
+        return '%sP%dW' % (sign, days // 7)
+
+    duration = sign + 'P'
+    if days:
+        duration += '%dD' % days
+    if hours or minutes or seconds or not days:
+        duration += 'T'
+        if hours:
+            duration += '%dH' % hours
+        if minutes:
+            duration += '%dM' % minutes
+        if seconds or not (hours or minutes):
+            duration += '%dS' % seconds
+
+    return duration
+
+
+RRULE_TZID_RE = re.compile(r'DTSTART;TZID=([^:;]+):', re.IGNORECASE)
+
+
+def rule_tzid(event, first_occurrence, settings):
+    """Name of the timezone the wall time of a recurring event is in, which
+    BYHOUR, BYDAY and friends of its rule refer to
+
+    Rules with a DTSTART in UTC return None. Rules with a TZID keep it,
+    naive rules are in Pelican's TIMEZONE, which should be the timezone the
+    site is built in, as naive occurrences are expanded in local time.
+
+    :returns: str or None
+    """
+    if first_occurrence.tzinfo is not None:
+        match = RRULE_TZID_RE.search(normalize_rrule(event.get('rrule', '')))
+        tzid = match.group(1) if match else None
+    else:
+        tzid = settings.get('TIMEZONE', 'UTC')
+        local_offset = first_occurrence.astimezone().utcoffset()
+        if first_occurrence.replace(tzinfo=rule_zone(tzid)).utcoffset() != local_offset:
+            log.warning("The recurring event named '%s' is expanded in the local timezone, "
+                        "which differs from TIMEZONE %s" % (event['title'], tzid))
+
+    return None if tzid == 'UTC' else tzid
+
+
+def rule_zone(tzid):
+    """tzinfo of a timezone name as returned by rule_tzid()
+
+    :returns: tzinfo
+    """
+    if tzid is None or tzid == 'UTC':
+        return timezone.utc
+
+    from zoneinfo import ZoneInfo
+
+    return ZoneInfo(tzid)
+
+
+def insert_recurring_events(build):
+    if not 'recurring_events' in build.settings['PLUGIN_EVENTS']:
+        return
+
+    plugin_settings = build.settings['PLUGIN_EVENTS']
+    expand = 'recurring_window_days' in plugin_settings or \
+        'recurring_max_occurrences' in plugin_settings
+    rrule_mode = plugin_settings.get('ics_recurring_rrule', False)
+
+    def expand_occurrences(event, rr, now):
         event_duration = parse_timedelta(event)
 
-        event = AttributeDict({
-            'url': f"pages/{event['page_url']}",
-            'location': event['location'],
-            'metadata': dict({
-                'title': event['title'],
-                'summary': event['summary'],
-                'date': next_occurrence,
-                'event-location' : event['location']
-            }),
-            'event_plugin_data': dict({
-                'dtstart': next_occurrence.astimezone(),
-                'dtend': next_occurrence.astimezone() + event_duration,
-            })
-        })
-        events.append(event)
-
-
-def generate_ical_file(generator):
-    """Generate an iCalendar file
+        for occurrence in recurring_occurrences(rr, now, plugin_settings):
+            dtstart = occurrence.astimezone()
+            uid = None
+            if expand and not rrule_mode:
+                # every occurrence needs its own UID in the ics file
+                uid = "%spages/%s#%s" % (build.settings['SITEURL'],
+                    event['page_url'], basic_utc_isoformat(dtstart))
+
+            # the ics file describes the rule instead of its occurrences in rrule_mode
+            yield Event(event, dtstart, dtstart + event_duration, occurrence,
+                        location=event['location'], uid=uid, recurring=rrule_mode)
+
+    for event in plugin_settings['recurring_events']:
+        # recurring rules work with naive local time unless they say otherwise
+        now = build.now.astimezone().replace(tzinfo=None)
+        rr = parse_recurring_rule(build, event, now)
+
+        first_occurrence = next(iter(rr), None)
+        if first_occurrence is not None and first_occurrence.tzinfo is not None:
+            # rules with a timezone aware DTSTART yield aware occurrences
+            now = now.astimezone()
+
+        if rrule_mode and rr.after(now) is not None:
+            tzid = rule_tzid(event, first_occurrence, build.settings)
+            zone = rule_zone(tzid)
+            if first_occurrence.tzinfo is None:
+                dtstart = first_occurrence.replace(tzinfo=zone)
+                rrule = ical_recur(rr, zone)
+            else:
+                dtstart = first_occurrence.astimezone(zone)
+                rrule = ical_recur(rr)
+
+            build.recurring_rules.append(RecurringRule(
+                event=event,
+                dtstart=dtstart,
+                duration=parse_timedelta(event),
+                rrule=rrule,
+                # the rules are taken from the settings at the day of the build
+                dtstamp=datetime.combine(build.now.astimezone().date(), time()).astimezone(),
+                tzid=tzid))
+
+        build.events.extend(expand_occurrences(event, rr, now))
+
+
+ICS_PRODID = '-//My calendar product//mxm.dk//'
+ICS_VERSION = '2.0'
+ICS_LINE_LIMIT = 75
+
+
+def escape_ical_text(text):
+    """Escape a value according to the iCalendar TEXT rules (RFC 5545 3.3.11)
+
+    :returns: str
     """
-    global events
-    ics_fname = generator.settings['PLUGIN_EVENTS']['ics_fname']
-    if not ics_fname:
+    # order matters: backslashes must be escaped before anything adds one
+    return str(text).replace('\\N', '\n') \
+        .replace('\\', '\\\\') \
+        .replace(';', '\\;') \
+        .replace(',', '\\,') \
+        .replace('\r\n', '\\n') \
+        .replace('\n', '\\n') \
+        .replace('\r', '\\n')
+
+
+def fold_ical_line(line):
+    """Fold a content line so that no physical line reaches 75 octets
+
+    Escape sequences are never split across a fold, the same way
+    icalendar does it.
+
+    :returns: str
+    """
+    if len(line) < ICS_LINE_LIMIT and line.isascii():
+        return line
+
+    folded_lines = []
+    current_chars = []
+    byte_count = 0
+    for char in line:
+        char_byte_len = len(char.encode('utf-8'))
+        if current_chars and byte_count + char_byte_len >= ICS_LINE_LIMIT:
+            if len(current_chars) > 1 and current_chars[-1] in '\\^':
+                escaped_prefix = current_chars.pop()
+                folded_lines.append(''.join(current_chars))
+                current_chars = [escaped_prefix]
+                byte_count = len(escaped_prefix.encode('utf-8'))
+            else:
+                folded_lines.append(''.join(current_chars))
+                current_chars = []
+                byte_count = 0
+        current_chars.append(char)
+        byte_count += char_byte_len
+
+    if current_chars:
+        folded_lines.append(''.join(current_chars))
+
+    return '\r\n '.join(folded_lines)
+
+
+def ical_content_line(name, value, escape=True):
+    """Serialize a single escaped and folded content line
+
+    :returns: bytes
+    """
+    if escape:
+        value = escape_ical_text(value)
+    return (fold_ical_line(name + ':' + str(value)) + '\r\n').encode('utf-8')
+
+
+def event_uid(generator, event):
+    """UID of the VEVENT describing an event
+
+    :returns: str
+    """
+    if event.uid:
+        return event.uid
+
+    return generator.settings['SITEURL'] + event.url
+
+
+def rule_uid(generator, rule):
+    """UID of the VEVENT describing a recurring event by its rule
+
+    :returns: str
+    """
+    return "%spages/%s" % (generator.settings['SITEURL'], rule.event['page_url'])
+
+
+def ordered_vevents(generator, events_list, rules=()):
+    """Order the events and recurring rules of a calendar by start and UID
+    so that identical input always results in an identical file, no matter
+    in which order Pelican read the content
+
+    :returns: list of ('event', Event) and ('rule', RecurringRule) tuples
+    """
+    keyed = [(e.dtstart, event_uid(generator, e), 0, i) for i, e in enumerate(events_list)]
+    keyed.extend((r.dtstart, rule_uid(generator, r), 1, i) for i, r in enumerate(rules))
+    keyed.sort()
+
+    return [('event', events_list[i]) if kind == 0 else ('rule', rules[i])
+            for _, _, kind, i in keyed]
+
+
+def ical_event_fields(generator, event, metadata_field_for_event_summary):
+    """Collect the properties of the VEVENT describing an event in the
+    order in which icalendar serializes them
+
+    :returns: list of (name, value) tuples
+    """
+    fields = [
+        ('SUMMARY', event.plain_summary(metadata_field_for_event_summary)),
+        ('DTSTART', event.dtstart_utc),
+        ('DTEND', event.dtend_utc),
+        ('DTSTAMP', event.dtstamp_utc),
+        ('UID', event_uid(generator, event)),
+    ]
+    if event.location is not None:
+        fields.append(('LOCATION', event.location))
+    fields.append(('PRIORITY', 5))
+
+    return fields
+
+
+def rule_dtstart_field(rule):
+    """DTSTART of a recurring event in UTC or with the TZID of its rule
+
+    :returns: (name, value) tuple
+    """
+    if rule.tzid is None:
+        return ('DTSTART', basic_utc_isoformat(rule.dtstart))
+    return ('DTSTART;TZID=%s' % rule.tzid, basic_local_isoformat(rule.dtstart))
+
+
+@lru_cache(maxsize=None)
+def vtimezone(tzid):
+    """VTIMEZONE describing a timezone named by the TZID of recurring events
+
+    :returns: icalendar.Timezone
+    """
+    import icalendar
+
+    return icalendar.Timezone.from_tzid(tzid)
+
+
+def calendar_tzids(vevents):
+    """Timezones the recurring events of a calendar refer to by TZID
+
+    :returns: sorted list of str
+    """
+    return sorted({item.tzid for kind, item in vevents if kind == 'rule' and item.tzid})
+
+
+def ical_rule_fields(generator, rule, metadata_field_for_event_summary):
+    """Collect the properties of the VEVENT describing a recurring event by
+    its rule in the order in which icalendar serializes them
+
+    :returns: list of (name, value) tuples
+    """
+    summary = rule.event.get(metadata_field_for_event_summary, rule.event['summary'])
+
+    return [
+        ('SUMMARY', strip_html_tags(summary)),
+        # BYHOUR, BYDAY and friends of the RRULE are wall time of DTSTART
+        rule_dtstart_field(rule),
+        ('DURATION', ical_duration(rule.duration)),
+        ('DTSTAMP', basic_utc_isoformat(rule.dtstamp)),
+        ('UID', rule_uid(generator, rule)),
+        ('RRULE', rule.rrule),
+        ('LOCATION', rule.event['location']),
+        ('PRIORITY', 5),
+    ]
+
+
+def load_vevent_cache(build):
+    """Load the VEVENTs serialized by previous builds from CACHE_PATH
+
+    Like the recurring rules cache the in-memory cache is kept for the
+    whole process, the VEVENTs used are tracked per build.
+    """
+    if build.settings['PLUGIN_EVENTS'].get('vevent_cache', False):
+        build.caches['vevent_cache'] = shared_cache(
+            os.path.join(build.settings['CACHE_PATH'], VEVENT_CACHE_FNAME), 'VEVENT cache')
+
+
+def save_vevent_cache(build):
+    """Store the VEVENTs used by the latest build of every output path in
+    CACHE_PATH for the next build and drop all others"""
+
+    cache = build.caches.get('vevent_cache')
+    if cache is None:
         return
 
-    if 'metadata_field_for_summary' in generator.settings['PLUGIN_EVENTS']:
-        metadata_field_for_event_summary = generator.settings['PLUGIN_EVENTS']['metadata_field_for_summary']
+    stats = build.cache_stats['vevent_cache']
+    log.debug("VEVENT cache: %d hits, %d misses" % (stats['hits'], stats['misses']))
 
-    if not metadata_field_for_event_summary:
-        metadata_field_for_event_summary = 'summary'
+    output_path = build.settings['OUTPUT_PATH']
+    with cache.lock:
+        # several sites, e.g. the subsites of i18n_subsites, may share CACHE_PATH
+        changed = cache.users.get(output_path) != build.vevents_used
+        cache.users[output_path] = build.vevents_used
+        gone = [path for path in cache.users if not os.path.exists(path)]
+        for path in gone:
+            del cache.users[path]
+        used = set().union(*cache.users.values())
 
-    ics_fname = os.path.join(generator.settings['OUTPUT_PATH'], ics_fname)
-    log.debug("Generating calendar at %s with %d events" % (ics_fname, len(events)))
+        unused = [key for key in cache.data if key not in used]
+        for key in unused:
+            del cache.data[key]
 
-    ical = icalendar.Calendar()
-    ical.add('prodid', '-//My calendar product//mxm.dk//')
-    ical.add('version', '2.0')
+        if (stats['dirty'] or changed or gone or unused) and cache.save():
+            stats['dirty'] = False
+
+
+def vevent_cache_key(generator, event, metadata_field_for_event_summary):
+    """Digest of everything that ends up in the VEVENT of an event, computed
+    without doing any of the formatting
+
+    :returns: bytes
+    """
+    key = '\x1f'.join((
+        PLUGIN_VERSION,
+        str(event.metadata[metadata_field_for_event_summary]),
+        repr(event.dtstart.timestamp()),
+        repr(event.dtend.timestamp()),
+        repr(event.date.timestamp()),
+        event_uid(generator, event),
+        # repr() tells a missing location from the text 'None'
+        repr(event.location),
+    ))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+def vevent_bytes(build, kind, item, metadata_field_for_event_summary):
+    """Serialize a single VEVENT
+
+    :returns: bytes
+    """
+    generator = build.generator
+    if kind != 'event':
+        return serialize_vevent(generator, kind, item, metadata_field_for_event_summary)
+
+    # calendar.ics and the calendars of categories, tags and authors share
+    # the VEVENT of an event
+    data = build.serialized_vevents.get(id(item))
+    if data is not None:
+        return data
+
+    cache = build.caches.get('vevent_cache')
+    if cache is not None:
+        stats = build.cache_stats['vevent_cache']
+        key = vevent_cache_key(generator, item, metadata_field_for_event_summary)
+        data = cache.data.get(key)
+        # the calendars of several languages are written in parallel
+        with build.lock:
+            build.vevents_used.add(key)
+            if data is not None:
+                stats['hits'] += 1
+            else:
+                stats['misses'] += 1
+                stats['dirty'] = True
+
+    if data is None:
+        data = serialize_vevent(generator, kind, item, metadata_field_for_event_summary)
+        if cache is not None:
+            cache.set(key, data)
+
+    build.serialized_vevents[id(item)] = data
+    return data
+
+
+def serialize_vevent(generator, kind, item, metadata_field_for_event_summary):
+    if kind == 'rule':
+        fields = ical_rule_fields(generator, item, metadata_field_for_event_summary)
+    else:
+        fields = ical_event_fields(generator, item, metadata_field_for_event_summary)
+
+    return b''.join([ical_content_line('BEGIN', 'VEVENT')]
+        + [ical_content_line(name, value, escape=(name != 'RRULE'))
+           for name, value in fields]
+        + [ical_content_line('END', 'VEVENT')])
+
+
+def write_ical_stream(f, build, vevents, metadata_field_for_event_summary):
+    """Write the calendar to the binary file object f one VEVENT at a time
+    instead of building the whole icalendar tree in memory
+
+    :returns: None
+    """
+    f.write(ical_content_line('BEGIN', 'VCALENDAR'))
+    f.write(ical_content_line('VERSION', ICS_VERSION))
+    f.write(ical_content_line('PRODID', ICS_PRODID))
+
+    for tzid in calendar_tzids(vevents):
+        f.write(vtimezone(tzid).to_ical())
 
-    DEFAULT_LANG = generator.settings['DEFAULT_LANG']
-    curr_events = events if not localized_events else localized_events[DEFAULT_LANG]
+    for kind, item in vevents:
+        f.write(vevent_bytes(build, kind, item, metadata_field_for_event_summary))
 
-    filtered_list = filter(lambda x: x.event_plugin_data["dtstart"] >= datetime.now().astimezone(), curr_events)
+    f.write(ical_content_line('END', 'VCALENDAR'))
+
+
+def build_ical(generator, vevents, metadata_field_for_event_summary):
+    """Build the calendar as an icalendar object tree
+
+    :returns: icalendar.Calendar
+    """
+    import icalendar
+
+    ical = icalendar.Calendar()
+    ical.add('prodid', ICS_PRODID)
+    ical.add('version', ICS_VERSION)
+
+    for tzid in calendar_tzids(vevents):
+        ical.add_component(vtimezone(tzid))
+
+    for kind, item in vevents:
+        if kind == 'rule':
+            icalendar_event = icalendar.Event()
+            for name, value in ical_rule_fields(generator, item, metadata_field_for_event_summary):
+                if name.startswith('DTSTART'):
+                    # icalendar adds the TZID of the timezone of DTSTART
+                    icalendar_event.add('dtstart', item.dtstart)
+                    continue
+                if name == 'RRULE':
+                    value = icalendar.vRecur.from_ical(value)
+                icalendar_event[name] = value
+
+            ical.add_component(icalendar_event)
+            continue
 
-    for e in filtered_list:
         icalendar_event = icalendar.Event(
-            summary=strip_html_tags(e.metadata[metadata_field_for_event_summary]),
-            dtstart=basic_utc_isoformat(e.event_plugin_data["dtstart"]),
-            dtend=basic_utc_isoformat(e.event_plugin_data["dtend"]),
-            dtstamp=basic_utc_isoformat(e.metadata['date']),
+            summary=item.plain_summary(metadata_field_for_event_summary),
+            dtstart=item.dtstart_utc,
+            dtend=item.dtend_utc,
+            dtstamp=item.dtstamp_utc,
             priority=5,
-            uid=generator.settings['SITEURL'] + e.url,
+            uid=event_uid(generator, item),
         )
-        if 'event-location' in e.metadata:
-            icalendar_event.add('location', e.metadata['event-location'])
+        if item.location is not None:
+            icalendar_event.add('location', item.location)
 
         ical.add_component(icalendar_event)
 
-    with open(ics_fname, 'wb') as f:
-        f.write(ical.to_ical())
+    return ical
+
+
+class HashingWriter:
+    """Binary file wrapper keeping track of size and digest of the data written"""
+
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        self.digest.update(data)
+        return self.f.write(data)
+
+
+def file_digest(fname, chunk_size=1 << 16):
+    digest = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest
+
+
+def write_file_if_changed(fname, write):
+    """Write a file through write(f) unless the result equals the existing
+    file
+
+    The data goes to a temporary file next to fname first, which then
+    atomically replaces fname, so readers never see a half written file.
+    Sizes are compared before any hashing.
+
+    :returns: (number of bytes, True if fname was replaced)
+    """
+    dirname, basename = os.path.split(fname)
+    tmp_fname = os.path.join(dirname, '.%s.%s.tmp' % (basename, os.urandom(6).hex()))
+
+    # os.open respects the umask, unlike the private files of tempfile
+    with os.fdopen(os.open(tmp_fname, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), 'wb') as f:
+        writer = HashingWriter(f)
+        try:
+            write(writer)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_fname)
+            raise
+
+    try:
+        unchanged = os.path.getsize(fname) == writer.size and \
+            file_digest(fname).digest() == writer.digest.digest()
+    except OSError:
+        unchanged = False
+
+    if unchanged:
+        os.unlink(tmp_fname)
+        log.debug("%s is unchanged, not rewriting it" % fname)
+        return writer.size, False
+
+    os.replace(tmp_fname, fname)
+    return writer.size, True
+
+
+def write_calendar(build, ics_fname, events_list, metadata_field_for_event_summary):
+    """Serialize the upcoming events of events_list and the recurring rules
+    into the calendar file ics_fname
+
+    :returns: (number of events in, number of VEVENTs, number of bytes, True if the file was replaced)
+    """
+    generator = build.generator
+    filtered_list = [e for e in events_list if e.dtstart >= build.now and not e.recurring]
+    vevents = ordered_vevents(generator, filtered_list, build.recurring_rules)
+
+    # the streaming writer produces the same bytes and can reuse the VEVENTs
+    # of the cache and of the calendars of categories, tags and authors
+    if generator.settings['PLUGIN_EVENTS'].get('ics_streaming', False) or \
+            'vevent_cache' in build.caches or ical_feed_patterns(generator.settings):
+        write = lambda f: write_ical_stream(f, build, vevents, metadata_field_for_event_summary)
+    else:
+        ical = build_ical(generator, vevents, metadata_field_for_event_summary)
+        write = lambda f: f.write(ical.to_ical())
+
+    size, replaced = write_file_if_changed(ics_fname, write)
+    return len(events_list) + len(build.recurring_rules), len(vevents), size, replaced
+
+
+# setting, attribute of the article generator listing all groups, groups of an event
+ICS_FEED_SETTINGS = (
+    ('ics_category_fname', 'categories', lambda e: [e.category] if getattr(e, 'category', None) else []),
+    ('ics_tag_fname', 'tags', lambda e: getattr(e, 'tags', None) or []),
+    ('ics_author_fname', 'authors', lambda e: getattr(e, 'authors', None) or []),
+)
+
+
+def ical_feed_patterns(settings):
+    """File name patterns of the configured calendars of categories, tags
+    and authors
+
+    :returns: list of (pattern, generator attribute, groups of an event) tuples
+    """
+    return [(settings['PLUGIN_EVENTS'][setting], attribute, groups)
+            for setting, attribute, groups in ICS_FEED_SETTINGS
+            if settings['PLUGIN_EVENTS'].get(setting)]
+
+
+def known_groups(generator, attribute):
+    """All categories, tags or authors of the site, no matter whether any
+    upcoming event belongs to them
+
+    Pelican keeps tags in a dict and turns categories and authors into
+    lists of (group, articles) tuples once the articles are read.
+
+    :returns: list
+    """
+    groups = getattr(generator, attribute, None) or ()
+    if isinstance(groups, dict):
+        return list(groups)
+    return [group for group, _ in groups]
+
+
+def write_ical_feeds(build, events_list, metadata_field_for_event_summary):
+    """Write the calendars of every category, tag and author configured by
+    `ics_category_fname`, `ics_tag_fname` and `ics_author_fname`
+
+    All feeds are collected in a single pass over the events and every
+    VEVENT is serialized once, its bytes are shared by calendar.ics and all
+    feeds it belongs to. The calendar an earlier build wrote for a category,
+    tag or author without upcoming events is emptied, so that no outdated
+    calendar is left in the output.
+
+    :returns: list of (number of events in, number of VEVENTs, number of bytes, True if the file was replaced)
+    """
+    generator = build.generator
+    patterns = ical_feed_patterns(generator.settings)
+    if not patterns:
+        return []
+
+    filtered_list = [e for e in events_list if e.dtstart >= build.now and not e.recurring]
+
+    output_path = generator.settings['OUTPUT_PATH']
+    feeds = defaultdict(list)
+    for pattern, attribute, _ in patterns:
+        for group in known_groups(generator, attribute):
+            fname = pattern.format(slug=group.slug)
+            if os.path.exists(os.path.join(output_path, fname)):
+                feeds.setdefault(fname, [])
+
+    for _, e in ordered_vevents(generator, filtered_list):
+        fnames = {pattern.format(slug=group.slug)
+                  for pattern, _, groups in patterns for group in groups(e)}
+        if not fnames:
+            continue
+
+        data = vevent_bytes(build, 'event', e, metadata_field_for_event_summary)
+        for fname in fnames:
+            feeds[fname].append(data)
+
+    header = ical_content_line('BEGIN', 'VCALENDAR') + \
+        ical_content_line('VERSION', ICS_VERSION) + \
+        ical_content_line('PRODID', ICS_PRODID)
+    footer = ical_content_line('END', 'VCALENDAR')
+
+    def write_feed(vevents):
+        def write(f):
+            f.write(header)
+            for data in vevents:
+                f.write(data)
+            f.write(footer)
+        return write
+
+    results = []
+    for fname, vevents in sorted(feeds.items()):
+        ics_fname = os.path.join(output_path, fname)
+        os.makedirs(os.path.dirname(ics_fname), exist_ok=True)
+        size, replaced = write_file_if_changed(ics_fname, write_feed(vevents))
+        results.append((len(vevents), len(vevents), size, replaced))
+
+    return results
+
 
+def language_ics_fname(ics_fname, lang):
+    """calendar.ics -> calendar.<lang>.ics"""
+    root, ext = os.path.splitext(ics_fname)
+    return '%s.%s%s' % (root, lang, ext)
 
-def generate_localized_events(generator):
+
+def is_main_site(generator):
+    """Whether the generator belongs to the main site and not to one of the
+    additional language subsites of i18n_subsites"""
+    return generator.settings['DEFAULT_LANG'] not in generator.settings.get('I18N_SUBSITES', {})
+
+
+def summary_field(settings):
+    """Metadata field holding the summary of an event"""
+    return settings['PLUGIN_EVENTS'].get('metadata_field_for_summary') or 'summary'
+
+
+def generate_ical_file(build):
+    """Generate an iCalendar file
+    """
+    generator = build.generator
+    ics_fname = generator.settings['PLUGIN_EVENTS']['ics_fname']
+    if not ics_fname:
+        return
+
+    metadata_field_for_event_summary = summary_field(generator.settings)
+
+    localized_events = build.localized_events
+    calendars = [(os.path.join(generator.settings['OUTPUT_PATH'], ics_fname),
+                  build.events if not localized_events else localized_events[generator.settings['DEFAULT_LANG']])]
+
+    # every subsite pass of i18n_subsites sees the events of all languages,
+    # the main site pass alone writes the calendars of every language
+    if generator.settings['PLUGIN_EVENTS'].get('ics_per_language', False) and \
+            localized_events and is_main_site(generator):
+        calendars.extend(
+            (os.path.join(generator.settings['OUTPUT_PATH'], language_ics_fname(ics_fname, lang)), v)
+            for lang, v in sorted(localized_events.items())
+            if lang != generator.settings['DEFAULT_LANG'])
+        # the default language calendar is serialized once and copied
+        aliases = [os.path.join(generator.settings['OUTPUT_PATH'],
+                                language_ics_fname(ics_fname, generator.settings['DEFAULT_LANG']))]
+    else:
+        aliases = []
+
+    with build.measure_stage('generate_ical_file') as stage:
+        for ics_fname, _ in calendars:
+            log.debug("Generating calendar at %s" % ics_fname)
+
+        if len(calendars) == 1:
+            results = [write_calendar(build, calendars[0][0], calendars[0][1],
+                                      metadata_field_for_event_summary)]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=generator.settings['PLUGIN_EVENTS'].get('ics_workers')) as executor:
+                results = list(executor.map(
+                    lambda calendar: write_calendar(build, calendar[0], calendar[1],
+                                                    metadata_field_for_event_summary),
+                    calendars))
+
+        results.extend(write_ical_feeds(build, calendars[0][1], metadata_field_for_event_summary))
+
+        for alias in aliases:
+            with open(calendars[0][0], 'rb') as src:
+                size, replaced = write_file_if_changed(alias, lambda f: shutil.copyfileobj(src, f))
+            results.append((0, 0, size, replaced))
+
+        for events_in, events_out, size, replaced in results:
+            stage['events_in'] += events_in
+            stage['events_out'] += events_out
+            if replaced:
+                build.stats['ics_bytes_written'] += size
+            else:
+                build.stats['ics_files_unchanged'] += 1
+
+
+def generate_localized_events(build):
     """ Generates localized events dict if i18n_subsites plugin is active """
 
-    if "i18n_subsites" in generator.settings["PLUGINS"]:
-        if not os.path.exists(generator.settings['OUTPUT_PATH']):
-            os.makedirs(generator.settings['OUTPUT_PATH'])
+    if "i18n_subsites" in build.settings["PLUGINS"]:
+        if not os.path.exists(build.settings['OUTPUT_PATH']):
+            os.makedirs(build.settings['OUTPUT_PATH'])
+
+        with build.measure_stage('generate_localized_events') as stage:
+            stage['events_in'] += len(build.events)
+            for e in build.events:
+                if "lang" in e.metadata:
+                    build.localized_events[e.metadata["lang"]].append(e)
+                    stage['events_out'] += 1
+                else:
+                    log.debug("event %s contains no lang attribute" % (e.metadata["title"],))
+
+
+def prepare_display_fields(build):
+    """Format the dates of every event once for all the lists, pages and
+    languages the event is rendered in
 
-        for e in events:
-            if "lang" in e.metadata:
-                localized_events[e.metadata["lang"]].append(e)
+    Dates are formatted with the `display_datetime_format` and
+    `display_time_format` settings, or like Python prints them by default.
+    """
+    settings = build.settings['PLUGIN_EVENTS']
+    datetime_format = settings.get('display_datetime_format')
+    time_format = settings.get('display_time_format')
+    field = summary_field(build.settings)
+
+    with build.measure_stage('prepare_display_fields') as stage:
+        stage['events_in'] += len(build.events)
+        for ev in build.events:
+            end_time = ev.dtend.time()
+            if datetime_format:
+                dtstart = ev.dtstart.strftime(datetime_format)
+                dtend = ev.dtend.strftime(datetime_format)
             else:
-                log.debug("event %s contains no lang attribute" % (e.metadata["title"],))
+                dtstart = str(ev.dtstart)
+                dtend = str(ev.dtend)
+            end = end_time.strftime(time_format) if time_format else str(end_time)
+            ev._display = (dtstart, dtend, end, field)
+            stage['events_out'] += 1
 
 
-def populate_context_variables(generator):
-    """Populate the event_list and upcoming_events_list variables to be used in jinja templates"""
+def build_interval_tree(events_list, indexes):
+    """Build a centered interval tree over the events at the given indexes,
+    which are in the order of their start
 
-    filter_future = lambda ev: ev.event_plugin_data["dtend"].date() >= datetime.now().date()
+    Every node holds the events running at its center, sorted by start and
+    by descending end, the events ending before and starting after the
+    center go to the left and right subtree.
 
-    if not localized_events:
-        generator.context['events_list'] = sorted(events, reverse = True,
-                                                  key=lambda ev: (ev.event_plugin_data["dtstart"], ev.event_plugin_data["dtend"]))
-        generator.context['upcoming_events_list'] = sorted(filter(filter_future, events),
-                                                  key=lambda ev: (ev.event_plugin_data["dtstart"], ev.event_plugin_data["dtend"]))
-    else:
-        generator.context['events_list'] = {k: sorted(v, reverse = True,
-                                                      key=lambda ev: (ev.event_plugin_data["dtstart"], ev.event_plugin_data["dtend"]))
-                                            for k, v in localized_events.items()}
+    :returns: (center, by start, by end, left, right) tuple or None
+    """
+    if not indexes:
+        return None
+
+    # the median event contains its own start, so no node is ever empty
+    center = events_list[indexes[len(indexes) // 2]].dtstart
+    left, here, right = [], [], []
+    for i in indexes:
+        if events_list[i].dtend <= center:
+            left.append(i)
+        elif events_list[i].dtstart > center:
+            right.append(i)
+        else:
+            here.append(i)
+
+    by_end = sorted(here, key=lambda i: events_list[i].dtend, reverse=True)
+    return (center, here, by_end,
+            build_interval_tree(events_list, left), build_interval_tree(events_list, right))
+
+
+def as_local_datetime(value):
+    """Start of the day of a date, or a datetime in the local timezone if it
+    has none
+
+    :returns: timezone aware datetime
+    """
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value
+
+
+class EventIndex:
+    """Interval index over the start and end of events sorted by their
+    `event_sort_key`, answering range queries in O(log n + k)
+
+    The events starting within a range are a slice of the list found by
+    bisection. The events that started earlier and are still running at the
+    start of the range are found by a stabbing query on an interval tree,
+    which is only built on the first such query.
+    """
+    __slots__ = ('events', 'starts', 'today', '_tree')
+
+    def __init__(self, ascending, today):
+        self.events = ascending
+        self.starts = [ev.dtstart for ev in ascending]
+        self.today = today
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            # events without duration are never running at any point in time
+            self._tree = build_interval_tree(self.events, [
+                i for i, ev in enumerate(self.events) if ev.dtend > ev.dtstart]) or ()
+        return self._tree
+
+    def running_at(self, instant):
+        """Indexes of the events that started before instant and end after it
+
+        :returns: list of int in no particular order
+        """
+        found = []
+        node = self.tree
+        while node:
+            center, by_start, by_end, left, right = node
+            if instant > center:
+                for i in by_end:
+                    if self.events[i].dtend <= instant:
+                        break
+                    found.append(i)
+                node = right
+                continue
+
+            for i in by_start:
+                if self.events[i].dtstart >= instant:
+                    break
+                found.append(i)
+            node = left if instant < center else None
+
+        return found
+
+    def between(self, start, end):
+        """Events overlapping the time from start up to but excluding end,
+        each a date or datetime, in ascending order
+
+        :returns: list of Event
+        """
+        start = as_local_datetime(start)
+        end = as_local_datetime(end)
+
+        first = bisect_left(self.starts, start)
+        last = bisect_left(self.starts, end, first)
+
+        result = [self.events[i] for i in sorted(self.running_at(start))]
+        result.extend(self.events[first:last])
+        return result
+
+    def on(self, day=None):
+        """Events taking place on a day, the day of the build by default
+
+        :returns: list of Event
+        """
+        if day is None:
+            day = self.today
+        elif isinstance(day, datetime):
+            day = as_local_datetime(day).date()
+
+        return self.between(day, day + timedelta(days=1))
+
+
+def sorted_event_lists(index, today):
+    """Derive the list of current and upcoming events from the events of an
+    index, which are sorted already
+
+    Events are ordered by start, so everything starting today or later is a
+    single slice found by bisection. Of the events that started earlier only
+    those within the longest event duration before today can still be
+    running and need their end checked.
+
+    :returns: (events in descending order, upcoming events in ascending order)
+    """
+    ascending = index.events
+    if not ascending:
+        return [], []
+
+    starts = index.starts
+    max_duration = max(ev.dtend - ev.dtstart for ev in ascending)
+
+    first_today = bisect_left(starts, today)
+    first_running = bisect_left(starts, today - max_duration, 0, first_today)
+
+    upcoming = [ev for ev in ascending[first_running:first_today]
+                if ev.dtend.date() >= today.date()]
+    upcoming.extend(ascending[first_today:])
+
+    return ascending[::-1], upcoming
+
+
+def event_buckets(events_list):
+    """Group events in descending order by the years and the months they
+    take place in, in a single pass keeping their order
+
+    Events spanning several months or years are in every one of them.
+
+    :returns: (dict year -> list of Event, dict first day of month -> list of Event),
+              both newest first like events_list
+    """
+    by_year = defaultdict(list)
+    by_month = defaultdict(list)
+
+    for ev in events_list:
+        first = ev.dtstart.date()
+        last = ev.dtend.date()
+        # the end is exclusive, an event ending at midnight is over the day before
+        if last > first and ev.dtend.time() == time():
+            last -= timedelta(days=1)
+
+        if last.month == first.month and last.year == first.year:
+            by_year[first.year].append(ev)
+            by_month[first.replace(day=1)].append(ev)
+            continue
+
+        for year in range(first.year, last.year + 1):
+            by_year[year].append(ev)
+
+        month = date(first.year, first.month, 1)
+        while month <= last:
+            by_month[month].append(ev)
+            month = (month + timedelta(days=32)).replace(day=1)
+
+    # the buckets of long events may have been opened out of order
+    return (dict(sorted(by_year.items(), reverse=True)),
+            dict(sorted(by_month.items(), reverse=True)))
+
+
+CONTEXT_VARIABLES = ('events_list', 'upcoming_events_list', 'events_between', 'events_on',
+                     'events_by_year', 'events_by_month')
+
+
+def populate_context_variables(build):
+    """Populate the event_list and upcoming_events_list variables to be used in jinja
+    templates, along with the events_between and events_on range queries and the
+    events_by_year and events_by_month buckets"""
+
+    context = build.generator.context
+    # start of the current day in the local timezone
+    today = datetime.combine(build.now.date(), time()).astimezone()
+
+    def publish(events_list):
+        index = EventIndex(sorted(events_list, key=event_sort_key), today.date())
+        descending, upcoming = sorted_event_lists(index, today)
+        return (descending, upcoming, index.between, index.on) + event_buckets(descending)
+
+    with build.measure_stage('populate_context_variables') as stage:
+        if not build.localized_events:
+            context.update(zip(CONTEXT_VARIABLES, publish(build.events)))
+            stage['events_in'] += len(build.events)
+            stage['events_out'] += len(context['upcoming_events_list'])
+        else:
+            for name in CONTEXT_VARIABLES:
+                context[name] = {}
+            for k, v in sorted(build.localized_events.items()):
+                for name, value in zip(CONTEXT_VARIABLES, publish(v)):
+                    context[name][k] = value
+                stage['events_in'] += len(v)
+                stage['events_out'] += len(context['upcoming_events_list'][k])
+
+
+PAGINATED_EVENT_LISTS = ('events_list', 'upcoming_events_list')
+
+
+def write_paginated_event_lists(generator, writer):
+    """Render the events_list and upcoming_events_list templates page by page
+    when EVENTS_LIST_PAGINATION or UPCOMING_EVENTS_LIST_PAGINATION are set
+
+    Pages are cut from the sorted lists of the context by Pelican's
+    Paginator, which only slices the events of the page being rendered.
+    Templates see the events of the page under the name of the list and
+    Pelican's usual `<name>_paginator`, `<name>_page`,
+    `<name>_previous_page` and `<name>_next_page` variables.
+    """
+    for name in PAGINATED_EVENT_LISTS:
+        per_page = generator.settings.get('%s_PAGINATION' % name.upper())
+        save_as = generator.settings.get('%s_SAVE_AS' % name.upper(), '%s.html' % name)
+        url = generator.settings.get('%s_URL' % name.upper(), '%s.html' % name)
+        if not per_page or not save_as or name not in generator.context:
+            continue
+
+        if name in generator.settings['DIRECT_TEMPLATES']:
+            log.warning("The %s template is paginated by the events plugin, remove it from "
+                        "DIRECT_TEMPLATES to not render it with all events first" % name)
+
+        events_list = generator.context[name]
+        lang = None
+        if isinstance(events_list, dict):
+            lang = generator.settings['DEFAULT_LANG']
+            events_list = events_list.get(lang, [])
+
+        template = generator.get_template(name)
+        paginator = Paginator(save_as, url, events_list, generator.settings, per_page)
+        for number in paginator.page_range:
+            page = paginator.page(number)
+            writer.write_file(
+                page.save_as, template, generator.context,
+                generator.settings['RELATIVE_URLS'],
+                override_output=True,
+                url=page.url,
+                blog=True,
+                page_name=os.path.splitext(save_as)[0],
+                **{
+                    name: page.object_list if lang is None else {lang: page.object_list},
+                    name + '_paginator': paginator,
+                    name + '_page': page,
+                    name + '_previous_page': paginator.page(number - 1) if page.has_previous() else None,
+                    name + '_next_page': paginator.page(number + 1) if page.has_next() else None,
+                })
+
+
+class EventsBuild:
+    """Events collected by a single article generator pass
+
+    A build starts at `article_generator_init` and is finalized at
+    `article_generator_finalized`. Nothing is shared with the builds of
+    other generators, so passes like the ones of i18n_subsites may run
+    side by side. The parsed metadata, recurring rule and VEVENT caches are
+    kept for the whole process and shared by all builds using the same
+    CACHE_PATH, their hits and misses are counted per build.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.settings = generator.settings
+        self.events = []
+        self.localized_events = defaultdict(list)
+        self.recurring_rules = []
+        # timezone aware point in time the whole build is based on
+        self.now = snapshot_build_now(generator)
+        # per stage wall time and event counts, see measure_stage()
+        self.stats = {'stages': {}, 'ics_bytes_written': 0, 'ics_files_unchanged': 0}
+        # maps name of the cache -> SharedCache of the caches enabled for this build
+        self.caches = {}
+        self.cache_stats = {name: {'hits': 0, 'misses': 0, 'dirty': False}
+                            for name in CACHE_NAMES}
+        # digests of the VEVENTs this build took from or put into the VEVENT cache
+        self.vevents_used = set()
+        # maps id() of an event -> its serialized VEVENT, see vevent_bytes()
+        self.serialized_vevents = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure_stage(self, name):
+        """Add the wall time spent in the block to the named stage
+
+        The yielded dict may be used to count `events_in` and `events_out`.
+        """
+        stage = self.stats['stages'].setdefault(name, {
+            'calls': 0, 'seconds': 0.0, 'events_in': 0, 'events_out': 0})
+        start = perf_counter()
+        try:
+            yield stage
+        finally:
+            stage['calls'] += 1
+            stage['seconds'] += perf_counter() - start
+
+    def start(self):
+        """Load the caches and insert the occurrences of the recurring events"""
+
+        with self.measure_stage('initialize_events') as stage:
+            check_local_tzinfo_cache()
+            load_metadata_cache(self)
+            load_rrule_cache(self)
+            load_vevent_cache(self)
+            insert_recurring_events(self)
+            stage['events_out'] += len(self.events)
+
+    def finalize(self):
+        """Write the calendars, fill the template context and store the caches"""
+
+        generate_localized_events(self)
+        generate_ical_file(self)
+        prepare_display_fields(self)
+        populate_context_variables(self)
+        save_metadata_cache(self)
+        save_rrule_cache(self)
+        save_vevent_cache(self)
+        report_build_stats(self)
+
+
+class EventsRegistry:
+    """The builds in progress, keyed by the settings of their generator
+
+    Articles only carry the settings they were read with, which are the
+    settings of the generator reading them.
+    """
+
+    def __init__(self):
+        self.builds = {}
+        self.lock = threading.Lock()
+
+    def build(self, generator):
+        """Start a new build for generator, dropping an unfinished previous one
+
+        :returns: EventsBuild
+        """
+        build = EventsBuild(generator)
+        with self.lock:
+            self.builds[id(generator.settings)] = build
+        build.start()
+        return build
+
+    def get(self, settings):
+        """The build in progress for a generator with these settings
+
+        :returns: EventsBuild or None
+        """
+        with self.lock:
+            return self.builds.get(id(settings))
+
+    def finalize(self, generator):
+        """Finalize and forget the build of generator
+
+        :returns: EventsBuild or None if generator has no build in progress
+        """
+        with self.lock:
+            build = self.builds.get(id(generator.settings))
+            if build is None or build.generator is not generator:
+                return None
+            del self.builds[id(generator.settings)]
+
+        build.finalize()
+        return build
+
+
+events_registry = EventsRegistry()
 
-        generator.context['upcoming_events_list'] = {k: sorted(filter(filter_future, v),
-                                                      key=lambda ev: (ev.event_plugin_data["dtstart"], ev.event_plugin_data["dtend"]))
-                                            for k, v in localized_events.items()}
 
 def initialize_events(article_generator):
     """
-    Clears the events list before generating articles to properly support plugins with
+    Starts a fresh events build for every article generator to properly support plugins with
     multiple generation passes like i18n_subsites
     """
+    events_registry.build(article_generator)
 
-    del events[:]
-    localized_events.clear()
-    insert_recurring_events(article_generator)
+def finalize_events(article_generator):
+    """
+    Finalizes the events build of the article generator
+    """
+    events_registry.finalize(article_generator)
 
 def register():
     signals.article_generator_init.connect(initialize_events)
     signals.content_object_init.connect(parse_article)
-    signals.article_generator_finalized.connect(generate_localized_events)
-    signals.article_generator_finalized.connect(generate_ical_file)
-    signals.article_generator_finalized.connect(populate_context_variables)
+    signals.article_generator_finalized.connect(finalize_events)
+    signals.article_writer_finalized.connect(write_paginated_event_lists)
 
 
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+The streaming ics writer must produce exactly the bytes of icalendar,
+which escapes and folds the content lines the same way since 7.3.0.
+"""
+
+import importlib.util
+import io
+import os.path
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from pelican.settings import DEFAULT_CONFIG
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_plugin():
+    spec = importlib.util.spec_from_file_location(
+        'events_plugin_test', os.path.join(PLUGIN_DIR, 'events.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+events = load_plugin()
+
+TEXTS = [
+    'plain',
+    'comma, semicolon; backslash \\ colon: done',
+    'literal \\N and \\n and \\, and \\;',
+    'line\nfeed, carriage\r\nreturn and lone\rreturn',
+    'trailing backslash \\',
+    '<p>markup &amp; <b>entities</b></p>',
+    'ä' * 80,
+    'x' * 72 + 'ä€😀' * 10,
+    '😀' * 40,
+    'é' * 60,
+]
+
+# move an escape sequence, a multibyte character and a line break over
+# every position around the fold of the SUMMARY line
+for offset in range(60, 80):
+    for tail in ('\\', ',', ';', '\n', 'ä', '€', '😀', '\\\\,'):
+        TEXTS.append('y' * offset + tail + 'z' * 20)
+
+
+def make_generator():
+    settings = dict(DEFAULT_CONFIG)
+    settings['SITEURL'] = 'https://example.org'
+    settings['PLUGIN_EVENTS'] = {
+        'ics_fname': 'calendar.ics',
+        'now': '2024-06-01T12:00:00+00:00',
+    }
+    return SimpleNamespace(settings=settings, context={})
+
+
+def make_event(i, text):
+    start = datetime(2024, 6, 2, 10, 0, tzinfo=timezone.utc) + timedelta(hours=i)
+    source = {
+        'title': 'Event %d' % i,
+        'summary': text,
+        'page_url': 'event-%d-%s.html' % (i, 'u' * (i % 90)),
+    }
+    return events.Event(source, start, start + timedelta(hours=2),
+                        datetime(2024, 1, 1, tzinfo=timezone.utc),
+                        location=text if i % 2 else None)
+
+
+def write_both(vevents):
+    generator = make_generator()
+    build = events.EventsBuild(generator)
+
+    stream = io.BytesIO()
+    events.write_ical_stream(stream, build, vevents, 'summary')
+
+    return stream.getvalue(), events.build_ical(generator, vevents, 'summary').to_ical()
+
+
+@pytest.mark.parametrize('i, text', list(enumerate(TEXTS)))
+def test_stream_matches_icalendar(i, text):
+    streamed, tree = write_both([('event', make_event(i, text))])
+    assert streamed == tree
+
+
+def test_calendar_matches_icalendar():
+    vevents = [('event', make_event(i, text)) for i, text in enumerate(TEXTS)]
+    streamed, tree = write_both(vevents)
+    assert streamed == tree
+
+
+def test_folded_lines_fit_the_limit():
+    vevents = [('event', make_event(i, text)) for i, text in enumerate(TEXTS)]
+    streamed, _ = write_both(vevents)
+    # RFC 5545 3.1: at most 75 octets, the space starting a continuation included
+    for line in streamed.split(b'\r\n'):
+        assert len(line) <= events.ICS_LINE_LIMIT
+
+
+RULES = [
+    {'title': 'Naive', 'summary': 'in TIMEZONE', 'page_url': 'naive.html', 'location': 'Lab',
+     'rrule': 'FREQ=MONTHLY;BYDAY=4TU;BYHOUR=19;DTSTART=20230528T190000;UNTIL=20300101T000000',
+     'event-duration': '2h'},
+    {'title': 'UTC', 'summary': 'in UTC', 'page_url': 'utc.html', 'location': 'Lab',
+     'rrule': 'FREQ=WEEKLY;BYDAY=MO;DTSTART=20260105T180000Z', 'event-duration': '1h'},
+    {'title': 'Zoned', 'summary': 'with TZID', 'page_url': 'zoned.html', 'location': 'Lab',
+     'rrule': 'DTSTART;TZID=America/New_York:20230528T190000\nRRULE:FREQ=WEEKLY;UNTIL=20300101T050000Z',
+     'event-duration': '1h'},
+]
+
+
+def test_rules_match_icalendar():
+    generator = make_generator()
+    generator.settings['TIMEZONE'] = 'Europe/Berlin'
+    generator.settings['PLUGIN_EVENTS'].update(recurring_events=RULES, ics_recurring_rrule=True)
+    build = events.EventsBuild(generator)
+    events.insert_recurring_events(build)
+    vevents = events.ordered_vevents(generator, [], build.recurring_rules)
+
+    stream = io.BytesIO()
+    events.write_ical_stream(stream, build, vevents, 'summary')
+    assert stream.getvalue() == events.build_ical(generator, vevents, 'summary').to_ical()
+
+    lines = stream.getvalue().decode('utf-8').split('\r\n')
+    assert 'DTSTART:20260105T180000Z' in lines
+    assert 'DTSTART;TZID=America/New_York:20230528T190000' in lines
+    assert 'DTSTART;TZID=Europe/Berlin:20230627T190000' in lines
+    assert lines.count('BEGIN:VTIMEZONE') == 2